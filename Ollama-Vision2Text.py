@@ -1,161 +1,845 @@
-#!pip install subprocess ollama PySide6
-
-import subprocess
-import ollama
+#!pip install ollama PySide6 Pillow
+#!pip install numpy opencv-python  # Optional: semantic cache, faster image decoding
+
+import base64
+import errno
+import hashlib
+import importlib
+import json
+import mmap
 import sys
 import socket
 import os
+import queue
+import select
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from functools import lru_cache
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout,
     QLabel, QComboBox, QTextEdit, QPushButton, QMessageBox, QCheckBox,
-    QSizePolicy, QProgressBar, QTabWidget, QGraphicsView, QGraphicsScene,
+    QSizePolicy, QSpinBox, QProgressBar, QTabWidget, QGraphicsView, QGraphicsScene,
     QGraphicsPixmapItem
 )
-from PySide6.QtCore import Qt, Signal, Slot, QThread, QObject
-from PySide6.QtGui import QTextOption, QPixmap, QDragEnterEvent, QDropEvent, QClipboard
+from PySide6.QtCore import Qt, Signal, Slot, QObject, QRunnable, QThreadPool, QTimer
+from PySide6.QtGui import QTextOption, QTextCursor, QImage, QPixmap, QDragEnterEvent, QDropEvent, QClipboard
 
 
 # Constants
 RESPONSE_CONTENT_OLLAMA_FILE = "content_out@ollama.md"
 TEMP_IMAGE_FILE = "temp.jpg"
+TEMP_SCALED_IMAGE_FILE = "temp_scaled_{}.jpg"  # Downscaled copies sent to the vision model, by image index
+MAX_IMAGE_EDGE = 1280  # Default longest image edge, in pixels, sent to the vision model
+HASH_CHUNK_SIZE = 1 << 20  # Bytes hashed per step for very large images
+HASH_CHUNK_THRESHOLD = 64 << 20  # Files above this size are hashed in chunks
+VISION_PROMPT = "Extract text from this image:"
+VISION_PROMPT_MULTI = "Extract text from these images:"
 OLLAMA_HOST = "localhost"  # Default Ollama host
 OLLAMA_PORT = 11434  # Default Ollama port
+OLLAMA_PROBE_TIMEOUT = 0.1  # Seconds to wait for the startup port check
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps a model loaded after a request
+SHUTDOWN_WAIT_MS = 2000  # How long closing the window waits for cancelled queries to stop
+CANCEL_POLL_INTERVAL = 0.1  # Seconds between cancel checks while waiting on Ollama
+NO_MODELS_PLACEHOLDER = "No models available"
+MODELS_CACHE_TTL = 30  # Seconds before the cached model list is refreshed
+
+RESPONSE_CACHE_DB = "ollama_cache.sqlite"  # Persistent response cache
+RESPONSE_CACHE_SIZE = 128  # Maximum number of responses kept in memory
+RESPONSE_CACHE_MAX_ROWS = 10000  # Maximum number of responses kept on disk
+RESPONSE_CACHE_MAX_AGE = 30 * 24 * 3600  # Seconds before an on-disk response is dropped
+EMBED_MODEL = "nomic-embed-text"  # Ollama model used for semantic cache lookups
+SEMANTIC_CACHE_THRESHOLD = 0.95  # Minimum cosine similarity to reuse a cached response
+
+_MODELS_CACHE = {"ts": 0.0, "val": [], "digests": {}, "embedding": set()}
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_LOCK = threading.Lock()  # Workers run on their own threads
+_RESPONSE_CACHE_DB = None  # sqlite3 connection, opened by open_response_cache()
+_EMBEDDINGS_AVAILABLE = True  # Cleared if numpy or EMBED_MODEL cannot be used
+_IMAGE_DIGESTS = {}  # path -> (mtime_ns, size, digest), so unchanged files are not re-hashed
+
+
+# ollama, asyncio, Pillow, numpy and OpenCV are imported on first use rather than at startup;
+# together they account for most of the interpreter's cold-start time.
+@lru_cache(maxsize=None)
+def optional_import(name):
+    """Imports an optional dependency on first use, returning None if it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Returns the shared Ollama client, so HTTP connections are kept alive between requests."""
+    import ollama
+
+    return ollama.Client(host=f"http://{OLLAMA_HOST}:{OLLAMA_PORT}")
 
 
-def get_ollama_models():
-    """Retrieves a list of available Ollama models using 'ollama list'.
+def get_ollama_models(force=False):
+    """Retrieves the sorted list of available Ollama models from the daemon's /api/tags endpoint.
+    Results are cached for MODELS_CACHE_TTL seconds; pass force=True to bypass the cache.
+    Failures are cached too, so an unreachable daemon is not retried (and reported) on every call.
     Handles potential errors gracefully and provides informative messages.
     """
+    now = time.monotonic()
+    if not force and _MODELS_CACHE["ts"] and now - _MODELS_CACHE["ts"] < MODELS_CACHE_TTL:
+        return list(_MODELS_CACHE["val"])
+
     try:
-        output = subprocess.check_output(['ollama', 'list'], text=True, stderr=subprocess.PIPE)
-        model_names = [
-            detail.split()[0]
-            for detail in output.split('\n')
-            if detail and detail.split()[0] != "NAME"  # Prevent empty strings and header from being processed
-        ]
-        return model_names
-    except subprocess.CalledProcessError as e:
-        print(f"Error listing models: {e}")
-        print(f"Ollama output: {e.output}")
-        return []
-    except FileNotFoundError:
-        print("Error: Ollama command not found. Ensure Ollama is installed and in your system's PATH.")
-        return []
+        url = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags"
+        with urllib.request.urlopen(url, timeout=1) as response:
+            data = json.loads(response.read())
+        models = data.get("models", [])
+        model_names = sorted(model["name"] for model in models)
+        _MODELS_CACHE["ts"] = now
+        _MODELS_CACHE["val"] = model_names
+        _MODELS_CACHE["digests"] = {model["name"]: model.get("digest", "") for model in models}
+        _MODELS_CACHE["embedding"] = {model["name"] for model in models if _looks_like_embedding_model(model)}
+        return list(model_names)
+    except urllib.error.URLError as e:
+        print(f"Error listing models: could not reach Ollama at {OLLAMA_HOST}:{OLLAMA_PORT} ({e.reason})")
+    except (ValueError, KeyError) as e:
+        print(f"Error parsing model list from Ollama: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        return []
+    # Digests are kept, so cached responses stay reachable while the daemon is down
+    _MODELS_CACHE["ts"] = now
+    _MODELS_CACHE["val"] = []
+    return []
 
 
-def get_response(system_message, user_input, llm_model, images=None):
-    """Retrieves a response from the specified Ollama model.
-    Includes error handling for API requests.
+def _looks_like_embedding_model(model):
+    """Guesses from an /api/tags entry whether a model only produces embeddings.
+    The tags endpoint does not report capabilities, so this relies on BERT-family (encoder-only)
+    architectures and on EMBED_MODEL itself.
+    """
+    details = model.get("details") or {}
+    families = details.get("families") or [details.get("family")]
+    return model["name"].split(":")[0] == EMBED_MODEL or any(family and "bert" in family for family in families)
+
+
+def is_embedding_model(llm_model):
+    """Returns True if the listed model only produces embeddings and cannot chat."""
+    return llm_model in _MODELS_CACHE["embedding"]
+
+
+def model_identity(llm_model):
+    """Returns the model name tagged with its current digest, so re-pulling a tag changes its identity.
+    The digest comes from the (TTL-cached) model list; it is omitted if the model is not listed.
+    """
+    get_ollama_models()  # Refreshes the digests once the model list cache has expired
+    digest = _MODELS_CACHE["digests"].get(llm_model)
+    return f"{llm_model}@{digest}" if digest else llm_model
+
+
+def downscale_image(image_path, max_edge=MAX_IMAGE_EDGE, output_path=TEMP_SCALED_IMAGE_FILE.format(0)):
+    """Shrinks an image so its longest edge is at most max_edge pixels.
+    Returns output_path holding the JPEG copy, or image_path unchanged if it is already small enough.
     """
+    from PIL import Image
+
+    cv2 = optional_import("cv2")  # Image decoding and resizing fall back to Pillow without OpenCV
+    with Image.open(image_path) as img:  # Only the header is read here
+        if max(img.size) <= max_edge:
+            return image_path
+
+        if cv2 is not None:
+            array = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if array is not None:
+                height, width = array.shape[:2]
+                scale = max_edge / max(width, height)
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                array = cv2.resize(array, size, interpolation=cv2.INTER_AREA)
+                if not cv2.imwrite(output_path, array, [cv2.IMWRITE_JPEG_QUALITY, 85]):
+                    raise OSError(f"Could not write {output_path}")
+                return output_path
+
+        img.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR)  # Bilinear is plenty for model input
+        img.convert("RGB").save(output_path, "JPEG", quality=85)
+    return output_path
+
+
+def load_scaled_pixmap(image_path, width, height, device_pixel_ratio=1.0):
+    """Loads an image scaled down to fit width x height logical pixels, keeping its aspect ratio.
+    The image is resampled to physical pixels (device_pixel_ratio), so HiDPI screens stay sharp
+    without decoding more than is displayed. Smaller images are never enlarged; callers scale the pixmap.
+    Uses OpenCV or Pillow (SIMD-accelerated when Pillow-SIMD is installed) before falling back to Qt;
+    returns a null pixmap if the image cannot be read.
+    """
+    from PIL import Image
+
+    cv2 = optional_import("cv2")
+    target_width = max(1, round(width * device_pixel_ratio))
+    target_height = max(1, round(height * device_pixel_ratio))
+    image = None
+
+    if cv2 is not None:
+        array = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if array is not None:
+            image_height, image_width = array.shape[:2]
+            scale = min(target_width / image_width, target_height / image_height, 1)
+            if scale < 1:
+                size = (max(1, round(image_width * scale)), max(1, round(image_height * scale)))
+                array = cv2.resize(array, size, interpolation=cv2.INTER_AREA)
+            image_height, image_width = array.shape[:2]
+            # QPixmap.fromImage below copies the pixels, so the numpy buffer may be released
+            image = QImage(array.data, image_width, image_height, array.strides[0], QImage.Format_BGR888)
+
+    if image is None:
+        try:
+            with Image.open(image_path) as img:
+                img.draft("RGB", (target_width, target_height))  # JPEG: decode at reduced scale
+                scale = min(target_width / img.width, target_height / img.height, 1)
+                size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                img = img.convert("RGBA")
+                if scale < 1:
+                    img = img.resize(size, Image.Resampling.BILINEAR)
+                data = img.tobytes()
+            image = QImage(data, size[0], size[1], size[0] * 4, QImage.Format_RGBA8888)
+        except OSError:
+            image = None
+
+    if image is not None:
+        pixmap = QPixmap.fromImage(image)
+    else:
+        pixmap = QPixmap(image_path)  # Last resort for formats neither library reads
+        if pixmap.isNull():
+            return pixmap
+        if pixmap.width() > target_width or pixmap.height() > target_height:
+            pixmap = pixmap.scaled(target_width, target_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    return pixmap
+
+
+def save_image_jpeg(image, path, quality=85):
+    """Saves a QImage as a JPEG, encoding with OpenCV when available."""
+    cv2 = optional_import("cv2")
+    if cv2 is not None:
+        np = optional_import("numpy")  # Always present alongside OpenCV
+        image = image.convertToFormat(QImage.Format_BGR888)
+        width, height = image.width(), image.height()
+        rows = np.frombuffer(image.constBits(), dtype=np.uint8, count=image.sizeInBytes())
+        array = rows.reshape(height, image.bytesPerLine())[:, :width * 3].reshape(height, width, 3)
+        if cv2.imwrite(path, array, [cv2.IMWRITE_JPEG_QUALITY, quality]):
+            return
+    if not image.save(path, 'JPEG', quality):
+        raise IOError(f"Could not save image to {path}")
+
+
+def image_digest(image_path):
+    """Returns a short BLAKE2b hex digest of an image file's contents.
+    Digests are remembered per path until the file's size or modification time changes.
+    """
+    stat = os.stat(image_path)
+    cached = _IMAGE_DIGESTS.get(image_path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    hasher = hashlib.blake2b(digest_size=16)
+    if stat.st_size:  # mmap cannot map an empty file
+        # Hash straight from the page cache instead of copying the file into a bytes object
+        with open(image_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if len(mapped) <= HASH_CHUNK_THRESHOLD:
+                hasher.update(mapped)
+            else:
+                with memoryview(mapped) as view:
+                    for offset in range(0, len(view), HASH_CHUNK_SIZE):
+                        hasher.update(view[offset:offset + HASH_CHUNK_SIZE])
+    digest = hasher.hexdigest()
+    _IMAGE_DIGESTS[image_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def encode_image(image_path):
+    """Reads an image file and returns its contents base64-encoded, as Ollama expects."""
+    with open(image_path, "rb") as file:
+        return base64.b64encode(file.read()).decode("ascii")
+
+
+def image_key(image):
+    """Returns a short digest of a base64-encoded image, hashed as-is without decoding it."""
+    return hashlib.blake2b(image.encode("ascii"), digest_size=16).hexdigest()
+
+
+def build_messages(system_message, user_input, images=None):
+    """Builds the chat message list for a query."""
     messages = [{'role': 'system', 'content': system_message}] if system_message else []
     messages.append({'role': 'user', 'content': user_input})
     if images:
         messages[-1]['images'] = images
+    return messages
+
+
+def response_cache_key(llm_model, messages):
+    """Builds the response cache key for a query; images are keyed by content, not path or encoding,
+    and the model by its digest, so answers from a since re-pulled model are not reused.
+    """
+    keyed_messages = [
+        {**message, 'images': [image_key(image) for image in message['images']]} if 'images' in message else message
+        for message in messages
+    ]
+    payload = json.dumps({'model': model_identity(llm_model), 'messages': keyed_messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def open_response_cache(path=RESPONSE_CACHE_DB):
+    """Opens (creating if needed) the on-disk response cache.
+    Failures are reported and leave the in-memory cache as the only tier.
+    """
+    global _RESPONSE_CACHE_DB
+    try:
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, response TEXT, ts REAL, model TEXT)"
+        )
+        if "model" not in {row[1] for row in connection.execute("PRAGMA table_info(cache)")}:
+            connection.execute("ALTER TABLE cache ADD COLUMN model TEXT")  # Caches written before pruning
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache(ts)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings("
+            "key TEXT PRIMARY KEY, model TEXT, system TEXT, embed_model TEXT, vector BLOB)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS embeddings_model ON embeddings(model, system, embed_model)")
+        prune_response_cache(connection)
+        connection.commit()
+    except sqlite3.Error as e:
+        print(f"Error opening response cache {path}: {e}")
+        return
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE_DB = connection
+
+
+def prune_response_cache(connection):
+    """Deletes on-disk responses older than RESPONSE_CACHE_MAX_AGE, beyond the newest RESPONSE_CACHE_MAX_ROWS,
+    or answered by a model digest Ollama no longer lists, together with their prompt embeddings.
+    """
+    models = get_ollama_models()
+    if models:  # Without a model list, every digest would look stale
+        identities = [model_identity(llm_model) for llm_model in models]
+        connection.execute(
+            f"DELETE FROM cache WHERE model IS NOT NULL AND model NOT IN ({','.join('?' * len(identities))})",
+            identities,
+        )
+    connection.execute("DELETE FROM cache WHERE ts < ?", (time.time() - RESPONSE_CACHE_MAX_AGE,))
+    connection.execute(
+        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+        (RESPONSE_CACHE_MAX_ROWS,),
+    )
+    connection.execute("DELETE FROM embeddings WHERE key NOT IN (SELECT key FROM cache)")
+
+
+def get_cached_response(key):
+    """Returns the cached response for key, or None on a miss.
+    Checks the in-memory LRU first, then the on-disk cache.
+    """
+    with _RESPONSE_CACHE_LOCK:
+        response = _RESPONSE_CACHE.get(key)
+        if response is not None:
+            _RESPONSE_CACHE.move_to_end(key)
+            return response
+        if _RESPONSE_CACHE_DB is None:
+            return None
+        try:
+            row = _RESPONSE_CACHE_DB.execute("SELECT response FROM cache WHERE key=?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading response cache: {e}")
+            return None
+    if row is None:
+        return None
+    cache_response(key, row[0], persist=False)  # Promote into the in-memory LRU
+    return row[0]
+
+
+def cache_response(key, response, persist=True, model=None):
+    """Stores a response, evicting the least recently used in-memory entry once the cache is full.
+    model is the answering model's identity, recorded so entries from a re-pulled model can be pruned.
+    """
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = response
+        _RESPONSE_CACHE.move_to_end(key)
+        while len(_RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+            _RESPONSE_CACHE.popitem(last=False)
+        if persist and _RESPONSE_CACHE_DB is not None:
+            try:
+                _RESPONSE_CACHE_DB.execute(
+                    "INSERT OR REPLACE INTO cache(key, response, ts, model) VALUES (?, ?, ?, ?)",
+                    (key, response, time.time(), model),
+                )
+                _RESPONSE_CACHE_DB.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing response cache: {e}")
+
+
+def embed_prompt(text):
+    """Returns the EMBED_MODEL embedding of text as a float32 vector, or None if unavailable.
+    Embedding is switched off for the session if numpy or EMBED_MODEL is missing;
+    other failures, such as a dropped connection, only skip this lookup.
+    """
+    global _EMBEDDINGS_AVAILABLE
+    if not _EMBEDDINGS_AVAILABLE or _RESPONSE_CACHE_DB is None:
+        return None
+    np = optional_import("numpy")
+    if np is None:  # Semantic caching is disabled without numpy
+        _EMBEDDINGS_AVAILABLE = False
+        return None
+    import ollama
+
+    try:
+        embedding = get_client().embeddings(model=EMBED_MODEL, prompt=text, keep_alive=OLLAMA_KEEP_ALIVE)['embedding']
+        return np.asarray(embedding, dtype=np.float32)
+    except ollama.ResponseError as e:
+        if e.status_code == 404:  # EMBED_MODEL has not been pulled
+            print(f"Semantic cache disabled, {EMBED_MODEL} is not available: {e}")
+            _EMBEDDINGS_AVAILABLE = False
+        else:
+            print(f"Skipping semantic cache lookup, could not embed with {EMBED_MODEL}: {e}")
+        return None
+    except Exception as e:
+        print(f"Skipping semantic cache lookup, could not embed with {EMBED_MODEL}: {e}")
+        return None
+
+
+def find_similar_response(llm_model, system_message, vector):
+    """Returns (response, similarity) for the cached response whose prompt embedding is closest
+    to vector, provided its cosine similarity reaches SEMANTIC_CACHE_THRESHOLD; otherwise None.
+    """
+    identity = model_identity(llm_model)  # May query Ollama, so resolved before taking the lock
+    with _RESPONSE_CACHE_LOCK:
+        try:
+            rows = _RESPONSE_CACHE_DB.execute(
+                "SELECT embeddings.vector, cache.response FROM embeddings "
+                "JOIN cache ON cache.key = embeddings.key "
+                "WHERE embeddings.model=? AND embeddings.system=? AND embeddings.embed_model=?",
+                (identity, system_message, EMBED_MODEL),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading semantic cache: {e}")
+            return None
+    rows = [row for row in rows if len(row[0]) == vector.nbytes]
+    if not rows:
+        return None
+
+    np = optional_import("numpy")
+    vectors = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(vector)
+    similarities = vectors @ vector / np.where(norms == 0, 1, norms)
+    best = int(np.argmax(similarities))
+    if similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return rows[best][1], float(similarities[best])
+    return None
+
+
+def store_embedding(key, llm_model, system_message, vector):
+    """Records the prompt embedding for a cached response."""
+    identity = model_identity(llm_model)  # May query Ollama, so resolved before taking the lock
+    with _RESPONSE_CACHE_LOCK:
+        try:
+            _RESPONSE_CACHE_DB.execute(
+                "INSERT OR REPLACE INTO embeddings(key, model, system, embed_model, vector) VALUES (?, ?, ?, ?, ?)",
+                (key, identity, system_message, EMBED_MODEL, vector.tobytes()),
+            )
+            _RESPONSE_CACHE_DB.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing semantic cache: {e}")
+
+
+def is_cancelled(cancel_event):
+    """Returns True once a query's cancel event, if it has one, has been set."""
+    return cancel_event is not None and cancel_event.is_set()
+
+
+def run_cancellable(func, cancel_event):
+    """Calls func() and returns its result, or None as soon as cancel_event is set.
+    A blocking Ollama call cannot be interrupted, so it runs on a daemon thread that is abandoned
+    on cancellation and does not keep the process alive. Exceptions from func are re-raised.
+    """
+    if cancel_event is None:
+        return func()
+    outcome = queue.Queue()
+
+    def call():
+        try:
+            outcome.put((True, func()))
+        except Exception as e:
+            outcome.put((False, e))
+
+    threading.Thread(target=call, daemon=True).start()
+    while True:
+        try:
+            succeeded, value = outcome.get(timeout=CANCEL_POLL_INTERVAL)
+        except queue.Empty:
+            if cancel_event.is_set():
+                return None
+            continue
+        if succeeded:
+            return value
+        raise value
+
+
+def get_response(system_message, user_input, llm_model, images=None, chunk_cb=None, use_cache=True,
+                 semantic_cb=None, cancel_event=None):
+    """Retrieves a response from the specified Ollama model.
+    The response is streamed; chunk_cb, if given, is called with each piece of text as it arrives.
+    Identical queries are answered from the response cache without calling Ollama,
+    and text-only prompts also match earlier prompts with a near-identical embedding. Such an answer
+    was written for a different prompt, so semantic_cb, if given, is called with the similarity.
+    With use_cache=False the model is always queried, and the fresh answer replaces any cached one.
+    Setting cancel_event returns within CANCEL_POLL_INTERVAL, even while the model is still loading;
+    whatever was streamed so far is returned and not cached.
+    Includes error handling for API requests.
+    """
+    messages = build_messages(system_message, user_input, images)
+    key = response_cache_key(llm_model, messages)
+    cached = get_cached_response(key) if use_cache else None
+
+    vector = None
+    if cached is None and use_cache and not images:
+        vector = run_cancellable(lambda: embed_prompt(user_input), cancel_event)
+        if vector is not None:
+            similar = find_similar_response(llm_model, system_message, vector)
+            if similar is not None:
+                # Not stored under this prompt's key: it answers a different prompt
+                cached, similarity = similar
+                if semantic_cb:
+                    semantic_cb(similarity)
+
+    if cached is not None:
+        if chunk_cb:
+            chunk_cb(cached)
+        return cached
+    if is_cancelled(cancel_event):
+        return ""
+
+    parts = []
+
+    def stream_response():
+        stream = get_client().chat(model=llm_model, messages=messages, stream=True, keep_alive=OLLAMA_KEEP_ALIVE)
+        try:
+            for chunk in stream:
+                if is_cancelled(cancel_event):
+                    break
+                partial = chunk['message']['content']
+                if not partial:
+                    continue
+                parts.append(partial)
+                if chunk_cb:
+                    chunk_cb(partial)
+        finally:
+            stream.close()  # Ends the HTTP stream if it was cut short
+        return ''.join(parts)
 
     try:
-        response = ollama.chat(model=llm_model, messages=messages)
-        return response['message']['content']
+        response = run_cancellable(stream_response, cancel_event)
+        if is_cancelled(cancel_event):
+            return ''.join(parts)  # Partial answers are not cached
+        cache_response(key, response, model=model_identity(llm_model))
+        if vector is not None:
+            store_embedding(key, llm_model, system_message, vector)
+        return response
     except Exception as e:
         print(f"Error getting response from Ollama: {e}")
         return f"Error: Could not get response from {llm_model}. Check the console for details."
 
 
-def save_response(response_content, filename=RESPONSE_CONTENT_OLLAMA_FILE):
-    """Appends the chatbot's response to a file.
-    Includes basic error handling.
+def get_responses_concurrently(system_message, user_input, llm_models, images=None, use_cache=True,
+                               cancel_event=None):
+    """Sends the same query to several Ollama models at once.
+    Cached responses are reused unless use_cache is False; the remaining models are queried concurrently
+    with asyncio.gather, so the total wait is that of the slowest model rather than the sum of all of them.
+    Setting cancel_event abandons the outstanding requests.
+    Returns a dict mapping each model to its response (or an error message), in llm_models order.
     """
+    import asyncio  # Only the comparison path needs it
+
+    messages = build_messages(system_message, user_input, images)
+    results = {}
+    pending = []
+    for llm_model in llm_models:
+        key = response_cache_key(llm_model, messages)
+        cached = get_cached_response(key) if use_cache else None
+        if cached is not None:
+            results[llm_model] = cached
+        else:
+            pending.append((llm_model, key))
+
+    async def query_all():
+        import ollama
+
+        client = ollama.AsyncClient(host=f"http://{OLLAMA_HOST}:{OLLAMA_PORT}")
+        try:
+            gathered = asyncio.gather(
+                *(
+                    client.chat(model=llm_model, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE)
+                    for llm_model, _ in pending
+                ),
+                return_exceptions=True,
+            )
+            if cancel_event is None:
+                return await gathered
+
+            async def wait_for_cancel():
+                while not cancel_event.is_set():
+                    await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+            watcher = asyncio.ensure_future(wait_for_cancel())
+            await asyncio.wait({gathered, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            watcher.cancel()
+            if gathered.done():
+                return gathered.result()
+            gathered.cancel()
+            try:
+                await gathered  # Let the cancelled requests unwind before the client closes
+            except asyncio.CancelledError:
+                pass
+            return None
+        finally:
+            # ollama.AsyncClient has no public close; close its httpx client before the loop goes away
+            await client._client.aclose()
+
+    if pending:
+        responses = asyncio.run(query_all())
+        if responses is None:  # Cancelled
+            responses = [asyncio.CancelledError("Request cancelled")] * len(pending)
+        for (llm_model, key), response in zip(pending, responses):
+            if isinstance(response, BaseException):
+                print(f"Error getting response from Ollama: {response}")
+                results[llm_model] = f"Error: Could not get response from {llm_model}. Check the console for details."
+                continue
+            results[llm_model] = response['message']['content']
+            cache_response(key, results[llm_model], model=model_identity(llm_model))
+    return {llm_model: results[llm_model] for llm_model in llm_models}
+
+
+def open_response_log(filename=RESPONSE_CONTENT_OLLAMA_FILE):
+    """Opens the response file for appending, or returns None if it cannot be opened."""
     try:
-        with open(filename, "w") as file:
-            file.write(response_content + "\n")
+        return open(filename, "a", encoding="utf-8")
     except IOError as e:
+        print(f"Error opening response file: {e}")
+        return None
+
+
+def save_response(response_content, file):
+    """Appends the chatbot's response to an open file.
+    Includes basic error handling.
+    """
+    if file is None:
+        return
+    try:
+        file.write(response_content + "\n")
+        file.flush()
+    except (IOError, ValueError) as e:
         print(f"Error saving response to file: {e}")
 
 
-def is_port_open(host, port):
+def is_port_open(host, port, timeout=OLLAMA_PROBE_TIMEOUT):
     """Check if a port is open on the specified host.
-    Improved error handling and reporting.
+    Uses a non-blocking connect bounded by timeout so a stopped server cannot stall startup.
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(1)  # Set a timeout to prevent indefinite blocking
-        try:
-            s.connect((host, port))
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.setblocking(False)
+            error = s.connect_ex((host, port))
+            if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                print(f"Connection to {host}:{port} failed: {os.strerror(error)}")
+                return False
+            _, writable, _ = select.select([], [s], [], timeout)
+            if not writable:
+                print(f"Connection to {host}:{port} timed out.")
+                return False
+            error = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)  # A refused connect is also "writable"
+            if error:
+                print(f"Connection to {host}:{port} failed: {os.strerror(error)}")
+                return False
             return True
-        except socket.timeout:
-            print(f"Connection to {host}:{port} timed out.")
-            return False
-        except socket.error as e:
-            print(f"Connection to {host}:{port} failed: {e}")
-            return False
-        except Exception as e:
-            print(f"An unexpected error occurred while checking port: {e}")
-            return False
+    except socket.error as e:
+        print(f"Connection to {host}:{port} failed: {e}")
+        return False
+    except Exception as e:
+        print(f"An unexpected error occurred while checking port: {e}")
+        return False
 
 
-class Worker(QObject):
-    """Worker thread for running Ollama queries."""
+class WorkerSignals(QObject):
+    """Signals emitted by the Ollama runnables (QRunnable is not a QObject)."""
     progress_changed = Signal(int)
+    partial_ready = Signal(str)  # Signal carrying each streamed piece of the response
     result_ready = Signal(str)
+    results_ready = Signal(dict)  # Per-model responses from a comparison
+    semantic_hit = Signal(float)  # The response was reused from a similar prompt, with this similarity
+    images_prepared = Signal(object)  # (image hashes, max edge, base64 payloads), so a resubmission can reuse them
     error_occurred = Signal(str)  # Signal to report errors
 
-    def __init__(self, system_message, user_input, selected_model, images=None):
+
+class OllamaRunnable(QRunnable):
+    """Thread pool task for running Ollama queries."""
+
+    def __init__(self, system_message, user_input, selected_model, images=None, use_cache=True,
+                 image_paths=None, max_image_edge=MAX_IMAGE_EDGE, prepared_images=None, cancel_event=None):
         super().__init__()
+        self.signals = WorkerSignals()
         self.system_message = system_message
         self.user_input = user_input
         self.selected_model = selected_model
-        self.images = images
+        self.use_cache = use_cache
+        self.cancel_event = cancel_event
+        self.images = images  # Base64-encoded images, sent as-is
+        self.image_paths = image_paths  # Source images, hashed, downscaled and encoded in run()
+        self.max_image_edge = max_image_edge
+        self.prepared_images = prepared_images  # An earlier images_prepared value, reused if it still matches
 
-    @Slot()
     def run(self):
-        """Queries the Ollama model and emits the response or an error."""
+        """Prepares any source images, queries the Ollama model and emits the response or an error."""
         try:
-            # Simulating progress updates
-            for progress in range(0, 100, 10):
-                self.progress_changed.emit(progress)
-                QThread.sleep(1)  # Simulate task delay
+            self.signals.progress_changed.emit(0)
+            if self.image_paths:
+                image_hashes = [image_digest(path) for path in self.image_paths]
+                if self.prepared_images and self.prepared_images[:2] == (image_hashes, self.max_image_edge):
+                    self.images = self.prepared_images[2]
+                else:
+                    images = []
+                    for index, path in enumerate(self.image_paths):
+                        if is_cancelled(self.cancel_event):
+                            self.signals.result_ready.emit("")
+                            return
+                        images.append(encode_image(
+                            downscale_image(path, self.max_image_edge, TEMP_SCALED_IMAGE_FILE.format(index))
+                        ))
+                    self.images = images
+                    # A paste may rewrite a file while it is read; only offer payloads known to match their hash
+                    if [image_digest(path) for path in self.image_paths] == image_hashes:
+                        self.signals.images_prepared.emit((image_hashes, self.max_image_edge, images))
+            response = get_response(
+                self.system_message, self.user_input, self.selected_model, self.images,
+                chunk_cb=self.signals.partial_ready.emit, use_cache=self.use_cache,
+                semantic_cb=self.signals.semantic_hit.emit, cancel_event=self.cancel_event,
+            )
+            self.signals.progress_changed.emit(100)  # Ensure progress reaches full
+
+            self.signals.result_ready.emit(response)
+        except Exception as e:
+            print(f"Error in worker thread: {e}")
+            self.signals.error_occurred.emit(str(e))
+            self.signals.progress_changed.emit(0)  # Reset progress on error
+
 
-            response = get_response(self.system_message, self.user_input, self.selected_model, self.images)
-            self.progress_changed.emit(100)  # Ensure progress reaches full
+class CompareRunnable(QRunnable):
+    """Thread pool task for querying several Ollama models with the same prompt."""
 
-            self.result_ready.emit(response)
+    def __init__(self, system_message, user_input, selected_models, images=None, use_cache=True,
+                 cancel_event=None):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.system_message = system_message
+        self.user_input = user_input
+        self.selected_models = selected_models
+        self.images = images
+        self.use_cache = use_cache
+        self.cancel_event = cancel_event
+
+    def run(self):
+        """Queries all models concurrently and emits their responses or an error."""
+        try:
+            self.signals.progress_changed.emit(0)
+            results = get_responses_concurrently(
+                self.system_message, self.user_input, self.selected_models, self.images, self.use_cache,
+                self.cancel_event,
+            )
+            self.signals.progress_changed.emit(100)  # Ensure progress reaches full
+
+            self.signals.results_ready.emit(results)
         except Exception as e:
             print(f"Error in worker thread: {e}")
-            self.error_occurred.emit(str(e))
-            self.progress_changed.emit(0)  # Reset progress on error
+            self.signals.error_occurred.emit(str(e))
+            self.signals.progress_changed.emit(0)  # Reset progress on error
 
 
 class DragDropImageView(QGraphicsView):
     """A widget for drag-and-drop image handling."""
 
-    image_dropped = Signal(str)
+    images_dropped = Signal(list)
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
         self.scene = QGraphicsScene()
         self.setScene(self.scene)
-        self.image_path = None  # Store the currently displayed image path
-
-    def display_image(self, image_path):
-        """Displays the given image in the graphics view."""
+        self.image_paths = []  # Store the currently displayed image paths
+        self._last_image_hash = None  # Hash of the last pasted clipboard image
+        self._source_pixmaps = []  # Decoded images, kept so resizes never go back to disk
+        self._pixmap_items = []
+
+        # Resizing uses fast scaling; a smooth pass runs once the size stops changing
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(50)
+        self._smooth_timer.timeout.connect(lambda: self._layout_pixmaps(Qt.SmoothTransformation))
+
+    def display_images(self, image_paths):
+        """Displays the given images side by side in the graphics view."""
         try:
-            self.scene.clear()
-            pixmap = QPixmap(image_path)
-            if pixmap.isNull():
-                raise ValueError(f"Could not load image from {image_path}")
-
-            # Scale the pixmap to fit within the view's size while maintaining aspect ratio
-            item = QGraphicsPixmapItem(pixmap.scaled(self.width(), self.height(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            self.scene.addItem(item)
-            self.setSceneRect(self.scene.itemsBoundingRect())  # Adjust scene size to fit image
-            self.image_path = image_path  # Store path to the displayed image
+            # Decode once, bounded by the screen size so later enlargements stay sharp
+            screen = self.screen()
+            bounds = screen.availableGeometry().size() if screen else self.size()
+            source_pixmaps = []
+            for image_path in image_paths:
+                pixmap = load_scaled_pixmap(image_path, bounds.width(), bounds.height(), self.devicePixelRatioF())
+                if pixmap.isNull():
+                    raise ValueError(f"Could not load image from {image_path}")
+                source_pixmaps.append(pixmap)
+
+            self.clear_images()
+            self._source_pixmaps = source_pixmaps
+            for _ in source_pixmaps:
+                item = QGraphicsPixmapItem()
+                item.setTransformationMode(Qt.SmoothTransformation)
+                self.scene.addItem(item)
+                self._pixmap_items.append(item)
+            self._layout_pixmaps(Qt.SmoothTransformation)
+            self.image_paths = list(image_paths)  # Store paths to the displayed images
 
         except Exception as e:
             print(f"Error displaying image: {e}")
             QMessageBox.critical(self, "Error", f"Could not display image: {e}")
 
+    def _layout_pixmaps(self, transformation_mode):
+        """Scales the decoded images to share the view's width, maintaining aspect ratio."""
+        if not self._source_pixmaps:
+            return
+        device_pixel_ratio = self.devicePixelRatioF()
+        slot_width = max(1, round(self.width() // len(self._source_pixmaps) * device_pixel_ratio))
+        slot_height = max(1, round(self.height() * device_pixel_ratio))
+        x = 0
+        for source, item in zip(self._source_pixmaps, self._pixmap_items):
+            pixmap = source.scaled(slot_width, slot_height, Qt.KeepAspectRatio, transformation_mode)
+            pixmap.setDevicePixelRatio(device_pixel_ratio)
+            item.setPixmap(pixmap)
+            item.setPos(x, 0)
+            x += item.boundingRect().width()
+        self.setSceneRect(self.scene.itemsBoundingRect())  # Adjust scene size to fit images
+
+    def clear_images(self):
+        """Removes the displayed images."""
+        self._smooth_timer.stop()
+        self.scene.clear()
+        self._source_pixmaps = []
+        self._pixmap_items = []
+        self.image_paths = []
+
+    def resizeEvent(self, event):
+        """Rescales the displayed images to the new view size."""
+        super().resizeEvent(event)
+        if self._source_pixmaps:
+            self._layout_pixmaps(Qt.FastTransformation)
+            self._smooth_timer.start()
+
     def dragEnterEvent(self, event: QDragEnterEvent):
         """Handles drag enter for image files."""
         if event.mimeData().hasUrls():
@@ -163,11 +847,13 @@ class DragDropImageView(QGraphicsView):
 
     def dropEvent(self, event: QDropEvent):
         """Handles drop events for image files."""
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):  # added more image types
-                self.image_dropped.emit(file_path)
-                break
+        file_paths = [
+            url.toLocalFile()
+            for url in event.mimeData().urls()
+            if url.toLocalFile().lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))  # added more image types
+        ]
+        if file_paths:
+            self.images_dropped.emit(file_paths)
         else:  # No acceptable file found
             QMessageBox.warning(self, "Warning", "Only image files (png, jpg, jpeg, gif, bmp) are supported.")
 
@@ -178,22 +864,43 @@ class DragDropImageView(QGraphicsView):
         if mime_data and mime_data.hasImage():
             try:
                 image = clipboard.image()
-                image.save(TEMP_IMAGE_FILE, 'JPEG')
-                self.image_dropped.emit(TEMP_IMAGE_FILE)
+                hasher = hashlib.blake2b(digest_size=16)
+                hasher.update(f"{image.width()}x{image.height()}:{image.format()}".encode())
+                hasher.update(image.constBits())
+                image_hash = hasher.hexdigest()
+                # Re-encode only when the clipboard content changed since the last paste
+                if image_hash != self._last_image_hash or not os.path.exists(TEMP_IMAGE_FILE):
+                    save_image_jpeg(image, TEMP_IMAGE_FILE)
+                    self._last_image_hash = image_hash
+                self.images_dropped.emit([TEMP_IMAGE_FILE])
             except Exception as e:
                 print(f"Error pasting image from clipboard: {e}")
                 QMessageBox.critical(self, "Error", f"Could not paste image from clipboard: {e}")
         else:
             QMessageBox.warning(self, "Warning", "No image found in clipboard.")
 
-    def get_image_path(self):
-        """Returns the path of the currently displayed image or None if no image is displayed."""
-        return self.image_path
+    def get_image_paths(self):
+        """Returns the paths of the currently displayed images, empty if no image is displayed."""
+        return list(self.image_paths)
 
 
 class OllamaChatbotApp(QWidget):
     def __init__(self):
         super().__init__()
+        self._prepared_images = None  # (image hashes, max edge, base64 payloads) of the last processed images
+        self._last_models = None  # Model list currently shown in the combo boxes
+
+        # Queries run on pooled threads: one for the 'Prompt' tab, one for the 'Vision' tab
+        self.thread_pool = QThreadPool.globalInstance()
+        self.thread_pool.setMaxThreadCount(2)
+        self.worker = None
+        self.vision_worker = None
+        # Cancel events of each tab's running query, set by Reset or when the window closes
+        self.prompt_cancel = None
+        self.vision_cancel = None
+
+        self.response_log = open_response_log()  # Kept open for the app's lifetime
+
         self.init_ui()
         self.check_ollama_available()
 
@@ -213,6 +920,11 @@ class OllamaChatbotApp(QWidget):
         self.add_prompt_tab()
         self.add_vision_tab()
 
+        # Response cache toggle, shared by both tabs; untick to regenerate an answer
+        self.use_cache_checkbox = QCheckBox("Use Cached Responses", self)
+        self.use_cache_checkbox.setChecked(True)
+        self.main_layout.addWidget(self.use_cache_checkbox)
+
         # Reload models now that both tabs have been added
         self.reload_models()
 
@@ -230,11 +942,21 @@ class OllamaChatbotApp(QWidget):
         self.model_combo = QComboBox(self)
         layout.addWidget(self.model_combo)
 
+        # Reload models button
+        self.reload_button = QPushButton("Reload Models", self)
+        self.reload_button.clicked.connect(lambda: self.reload_models(force=True))
+        layout.addWidget(self.reload_button)
+
         # Checkbox for system prompt visibility
         self.show_checkbox = QCheckBox("Show System Prompt", self)
         self.show_checkbox.stateChanged.connect(self.toggle_system_input)
         layout.addWidget(self.show_checkbox)
 
+        # Checkbox for querying every model at once
+        self.compare_checkbox = QCheckBox("Compare All Models", self)
+        self.compare_checkbox.stateChanged.connect(self.toggle_compare_results)
+        layout.addWidget(self.compare_checkbox)
+
         # System input
         self.system_input = QTextEdit(self)
         self.system_input.setPlaceholderText("System Prompt")
@@ -264,6 +986,17 @@ class OllamaChatbotApp(QWidget):
         self.result_label.setReadOnly(True)
         layout.addWidget(self.result_label)
 
+        # Notice shown when the answer was reused from a similar, not identical, prompt
+        self.semantic_notice_label = QLabel(self)
+        self.semantic_notice_label.setWordWrap(True)
+        self.semantic_notice_label.setVisible(False)
+        layout.addWidget(self.semantic_notice_label)
+
+        # Per-model results display when comparing
+        self.compare_tabs = QTabWidget(self)
+        self.compare_tabs.setVisible(False)
+        layout.addWidget(self.compare_tabs)
+
         # Reset button
         self.reset_button = QPushButton("Reset", self)
         self.reset_button.clicked.connect(self.reset_ui)
@@ -281,11 +1014,16 @@ class OllamaChatbotApp(QWidget):
         self.vision_model_combo = QComboBox(self)
         layout.addWidget(self.vision_model_combo)
 
+        # Reload models button
+        self.vision_reload_button = QPushButton("Reload Models", self)
+        self.vision_reload_button.clicked.connect(lambda: self.reload_models(force=True))
+        layout.addWidget(self.vision_reload_button)
+
         # Image preview area
         self.image_view = DragDropImageView(self)
         self.image_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # Make the view resizable
         self.image_view.setMinimumSize(150, 150)  # Optionally set a minimum size
-        self.image_view.image_dropped.connect(self.handle_image)
+        self.image_view.images_dropped.connect(self.handle_images)
         layout.addWidget(self.image_view)
 
         # Paste from clipboard button
@@ -293,6 +1031,14 @@ class OllamaChatbotApp(QWidget):
         self.paste_button.clicked.connect(self.image_view.paste_image_from_clipboard)
         layout.addWidget(self.paste_button)
 
+        # Longest edge sent to the model; smaller is faster, larger keeps more detail
+        layout.addWidget(QLabel("Max image edge (px):", self))
+        self.max_edge_spin = QSpinBox(self)
+        self.max_edge_spin.setRange(256, 4096)
+        self.max_edge_spin.setSingleStep(128)
+        self.max_edge_spin.setValue(MAX_IMAGE_EDGE)
+        layout.addWidget(self.max_edge_spin)
+
         # Process button
         self.process_image_button = QPushButton("Process Image", self)
         self.process_image_button.clicked.connect(self.process_image)
@@ -315,19 +1061,41 @@ class OllamaChatbotApp(QWidget):
         self.clear_image_button.clicked.connect(self.clear_vision_image)
         layout.addWidget(self.clear_image_button)
 
-    def reload_models(self):
-        """Reloads the model list in the combo boxes."""
-        model_list = get_ollama_models()
-        model_list.sort()
-        self.model_combo.clear()
-        self.model_combo.addItems(model_list if model_list else ["No models available"])
-        self.vision_model_combo.clear()
-        self.vision_model_combo.addItems(model_list if model_list else ["No models available"])
+    def reload_models(self, force=False):
+        """Reloads the model list in the combo boxes.
+        Uses the cached model list unless force is True.
+        """
+        model_list = get_ollama_models(force=force)  # Already sorted
+        if model_list == self._last_models:
+            return  # Leave the combos, and the user's selections, untouched
+        self._last_models = model_list
+
+        for combo in (self.model_combo, self.vision_model_combo):
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItems(model_list if model_list else [NO_MODELS_PLACEHOLDER])
+            combo.setCurrentText(current)  # Keep the selection if the model is still listed
+            combo.blockSignals(False)
+
+    @staticmethod
+    def set_progress_busy(progress_bar, busy):
+        """Switches a progress bar between an indeterminate busy indicator and a 0-100 range."""
+        if busy:
+            progress_bar.setRange(0, 0)
+        else:
+            progress_bar.setRange(0, 100)
 
     def toggle_system_input(self):
         """Toggles the visibility of the system input."""
         self.system_input.setVisible(self.show_checkbox.isChecked())
 
+    def toggle_compare_results(self):
+        """Switches the 'Prompt' tab between single and per-model result views."""
+        comparing = self.compare_checkbox.isChecked()
+        self.result_label.setVisible(not comparing)
+        self.compare_tabs.setVisible(comparing)
+
     @Slot()
     def on_submit(self):
         """Handles the 'Submit' button click in the 'Prompt' tab."""
@@ -339,31 +1107,59 @@ class OllamaChatbotApp(QWidget):
             QMessageBox.warning(self, "Warning", "Please select a model and enter a question.")
             return
 
-        self.submit_button.setEnabled(False)
-        self.progress_bar.setValue(0)
+        comparing = self.compare_checkbox.isChecked()
+        if comparing:
+            models = [
+                self.model_combo.itemText(index)
+                for index in range(self.model_combo.count())
+                if self.model_combo.itemText(index) != NO_MODELS_PLACEHOLDER
+                and not is_embedding_model(self.model_combo.itemText(index))  # They cannot answer a chat
+            ]
+            if not models:
+                QMessageBox.warning(self, "Warning", "No chat models are available to compare.")
+                return
+
+        self.submit_button.setEnabled(False)  # Re-enabled once the query finishes, even if Reset cancels it
+        self.prompt_cancel = threading.Event()
+        self.set_progress_busy(self.progress_bar, True)
         self.result_label.clear()  # Clear previous results
+        self.semantic_notice_label.setVisible(False)
+        self.clear_compare_tabs()
+
+        if comparing:
+            # Fan the prompt out to every model on a pooled thread
+            self.worker = CompareRunnable(
+                system_message, user_input, models, use_cache=self.use_cache_checkbox.isChecked(),
+                cancel_event=self.prompt_cancel,
+            )
+            self.worker.signals.progress_changed.connect(self.progress_bar.setValue)
+            self.worker.signals.results_ready.connect(self.display_compare_results)
+            self.worker.signals.error_occurred.connect(self.handle_prompt_error)
+            self.thread_pool.start(self.worker)
+            return
 
-        # Run worker thread for LLM query
-        self.worker_thread = QThread()
-        self.worker = Worker(system_message, user_input, selected_model)
-        self.worker.moveToThread(self.worker_thread)
-        self.worker.progress_changed.connect(self.progress_bar.setValue)
-        self.worker.result_ready.connect(self.display_prompt_result)
-        self.worker.error_occurred.connect(self.handle_worker_error)  # Handle errors from the worker thread
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker_thread.finished.connect(self.worker_thread.deleteLater)  # Clean up thread when finished
-        self.worker_thread.start()
-
-    @Slot(str)
-    def handle_image(self, image_path):
-        """Handles an image being dropped or pasted."""
-        self.image_view.display_image(image_path)
+        # Run LLM query on a pooled thread
+        self.worker = OllamaRunnable(
+            system_message, user_input, selected_model, use_cache=self.use_cache_checkbox.isChecked(),
+            cancel_event=self.prompt_cancel,
+        )
+        self.worker.signals.progress_changed.connect(self.progress_bar.setValue)
+        self.worker.signals.partial_ready.connect(self.append_prompt_partial)
+        self.worker.signals.semantic_hit.connect(self.show_semantic_notice)
+        self.worker.signals.result_ready.connect(self.display_prompt_result)
+        self.worker.signals.error_occurred.connect(self.handle_prompt_error)  # Handle errors from the worker thread
+        self.thread_pool.start(self.worker)
+
+    @Slot(list)
+    def handle_images(self, image_paths):
+        """Handles images being dropped or pasted."""
+        self.image_view.display_images(image_paths)
 
     @Slot()
     def process_image(self):
-        """Processes the image using Ollama Vision."""
-        image_path = self.image_view.get_image_path()  # Get the path to the displayed image
-        if not image_path:
+        """Processes the displayed images using Ollama Vision, all in a single request."""
+        image_paths = self.image_view.get_image_paths()  # Get the paths to the displayed images
+        if not image_paths:
             QMessageBox.warning(self, "Warning", "Please drop or paste an image first.")
             return
 
@@ -372,63 +1168,175 @@ class OllamaChatbotApp(QWidget):
             QMessageBox.warning(self, "Warning", "Please select a model.")
             return
 
+        max_edge = self.max_edge_spin.value()
+        prompt = VISION_PROMPT if len(image_paths) == 1 else VISION_PROMPT_MULTI
+        use_cache = self.use_cache_checkbox.isChecked()
+
         self.vision_result_label.clear()  # Clear previous results
-        self.vision_progress_bar.setValue(0)  # Reset vision progress bar
-
-        # Run worker thread for vision query
-        self.worker_thread = QThread()
-        self.worker = Worker("", "Extract text from this image:", selected_model, [image_path])
-        self.worker.moveToThread(self.worker_thread)
-        self.worker.progress_changed.connect(self.vision_progress_bar.setValue)
-        self.worker.result_ready.connect(self.display_vision_result)
-        self.worker.error_occurred.connect(self.handle_worker_error)
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker_thread.finished.connect(self.worker_thread.deleteLater)  # Clean up thread when finished
-        self.worker_thread.start()
+        self.set_progress_busy(self.vision_progress_bar, True)  # Show busy indicator while the model runs
+
+        # Run vision query on a pooled thread
+        self.process_image_button.setEnabled(False)
+        self.vision_cancel = threading.Event()
+        # The worker hashes, downscales and encodes the images, reusing the last ones if nothing changed
+        self.vision_worker = OllamaRunnable(
+            "", prompt, selected_model, use_cache=use_cache, image_paths=image_paths, max_image_edge=max_edge,
+            prepared_images=self._prepared_images, cancel_event=self.vision_cancel,
+        )
+        self.vision_worker.signals.images_prepared.connect(self.remember_prepared_images)
+        self.vision_worker.signals.progress_changed.connect(self.vision_progress_bar.setValue)
+        self.vision_worker.signals.partial_ready.connect(self.append_vision_partial)
+        self.vision_worker.signals.result_ready.connect(self.display_vision_result)
+        self.vision_worker.signals.error_occurred.connect(self.handle_vision_error)
+        self.thread_pool.start(self.vision_worker)
+
+    @Slot(object)
+    def remember_prepared_images(self, prepared):
+        """Keeps the (image hashes, max edge, base64 payloads) a worker prepared."""
+        self._prepared_images = prepared
+
+    @staticmethod
+    def append_partial(text_edit, text):
+        """Appends streamed text to the end of a read-only text edit."""
+        cursor = text_edit.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        text_edit.setTextCursor(cursor)
+        text_edit.insertPlainText(text)
+
+    @Slot(str)
+    def append_prompt_partial(self, text):
+        """Appends a streamed piece of the response in the 'Prompt' tab."""
+        if self.prompt_cancel.is_set():  # Reset cleared the view; drop the rest of the stream
+            return
+        self.append_partial(self.result_label, text)
+
+    @Slot(str)
+    def append_vision_partial(self, text):
+        """Appends a streamed piece of the response in the 'Vision' tab."""
+        self.append_partial(self.vision_result_label, text)
+
+    @Slot(float)
+    def show_semantic_notice(self, similarity):
+        """Flags that the 'Prompt' tab answer was reused from a similar earlier prompt."""
+        if self.prompt_cancel.is_set():
+            return
+        self.semantic_notice_label.setText(
+            f"Reused the answer to a similar earlier prompt (similarity {similarity:.2f}); "
+            "it was not generated for this prompt. Untick \"Use Cached Responses\" to generate a new one."
+        )
+        self.semantic_notice_label.setVisible(True)
 
     @Slot(str)
     def display_prompt_result(self, response):
         """Displays the result in the 'Prompt' tab."""
-        self.result_label.setPlainText(response)
-        save_response(response)
+        if self.prompt_cancel.is_set():  # Cancelled by Reset, which already cleared the view
+            self.finish_cancelled_prompt()
+            return
+        if self.result_label.toPlainText() != response:  # Already shown if it was streamed in full
+            self.result_label.setPlainText(response)
+        save_response(response, self.response_log)
+        self.set_progress_busy(self.progress_bar, False)
+        self.progress_bar.setValue(100)
+        self.submit_button.setEnabled(True)
+
+    def clear_compare_tabs(self):
+        """Removes the per-model result tabs and frees their widgets."""
+        for index in range(self.compare_tabs.count()):
+            self.compare_tabs.widget(index).deleteLater()  # QTabWidget.clear() does not delete pages
+        self.compare_tabs.clear()
+
+    @Slot(dict)
+    def display_compare_results(self, results):
+        """Displays one result tab per model in the 'Prompt' tab."""
+        if self.prompt_cancel.is_set():
+            self.finish_cancelled_prompt()
+            return
+        self.clear_compare_tabs()
+        for llm_model, response in results.items():
+            result_view = QTextEdit(self)
+            result_view.setWordWrapMode(QTextOption.WordWrap)
+            result_view.setReadOnly(True)
+            result_view.setPlainText(response)
+            self.compare_tabs.addTab(result_view, llm_model)
+        save_response(
+            "\n\n".join(f"## {llm_model}\n\n{response}" for llm_model, response in results.items()),
+            self.response_log,
+        )
+        self.set_progress_busy(self.progress_bar, False)
+        self.progress_bar.setValue(100)
         self.submit_button.setEnabled(True)
-        self.worker_thread.quit()
-        self.worker_thread.wait()
 
     @Slot(str)
     def display_vision_result(self, response):
         """Displays the result in the 'Vision' tab."""
-        self.vision_result_label.setPlainText(response)
-        save_response(response)
-        self.worker_thread.quit()
-        self.worker_thread.wait()
+        if self.vision_result_label.toPlainText() != response:  # Already shown if it was streamed in full
+            self.vision_result_label.setPlainText(response)
+        save_response(response, self.response_log)
+        self.set_progress_busy(self.vision_progress_bar, False)
+        self.vision_progress_bar.setValue(100)
+        self.process_image_button.setEnabled(True)
+
+    def finish_cancelled_prompt(self):
+        """Lets the 'Prompt' tab submit again once a cancelled query has stopped."""
+        self.set_progress_busy(self.progress_bar, False)
+        self.progress_bar.setValue(0)
+        self.submit_button.setEnabled(True)
 
     @Slot()
     def reset_ui(self):
-        """Resets the UI for the 'Prompt' tab."""
+        """Resets the UI for the 'Prompt' tab, cancelling any running query.
+        Submit stays disabled until that query has stopped, so queries never overlap.
+        """
+        if self.prompt_cancel is not None:
+            self.prompt_cancel.set()
         self.system_input.clear()
         self.question_input.clear()
         self.result_label.clear()
+        self.semantic_notice_label.setVisible(False)
+        self.clear_compare_tabs()
+        self.set_progress_busy(self.progress_bar, False)
         self.progress_bar.setValue(0)
-        self.submit_button.setEnabled(True)
 
     @Slot()
     def clear_vision_image(self):
         """Clears the image from the vision tab."""
-        self.image_view.scene.clear()
-        self.image_view.image_path = None  # Clear the stored image path
+        self.image_view.clear_images()  # Clear the displayed images and their stored paths
         self.vision_result_label.clear()  # Clear results as well
 
     @Slot(str)
-    def handle_worker_error(self, error_message):
-        """Handles errors that occur in the worker thread."""
+    def handle_prompt_error(self, error_message):
+        """Handles errors from a 'Prompt' tab query; the 'Vision' tab is left alone."""
+        if self.prompt_cancel.is_set():  # Nobody is waiting for a cancelled query
+            self.finish_cancelled_prompt()
+            return
         QMessageBox.critical(self, "Error", f"An error occurred: {error_message}")
         self.submit_button.setEnabled(True)  # Re-enable button on error
+        self.set_progress_busy(self.progress_bar, False)  # Stop the busy indicator
+        self.progress_bar.setValue(0)
+
+    @Slot(str)
+    def handle_vision_error(self, error_message):
+        """Handles errors from a 'Vision' tab query; the 'Prompt' tab is left alone."""
+        QMessageBox.critical(self, "Error", f"An error occurred: {error_message}")
         self.process_image_button.setEnabled(True)  # Re-enable the vision button
-        if self.tabs.currentIndex() == 0:
-            self.progress_bar.setValue(0)  # Reset progress bar if on the "Prompt" tab
-        self.worker_thread.quit()
-        self.worker_thread.wait()
+        self.set_progress_busy(self.vision_progress_bar, False)  # Stop the busy indicator
+        self.vision_progress_bar.setValue(0)
+
+    def closeEvent(self, event):
+        """Cancels running queries and closes the response file before the window closes."""
+        for cancel_event in (self.prompt_cancel, self.vision_cancel):
+            if cancel_event is not None:
+                cancel_event.set()
+        self.thread_pool.waitForDone(SHUTDOWN_WAIT_MS)  # Queries stop within CANCEL_POLL_INTERVAL of being cancelled
+        if self.response_log is not None:
+            try:
+                self.response_log.flush()
+                os.fsync(self.response_log.fileno())
+                self.response_log.close()
+            except (IOError, ValueError) as e:
+                print(f"Error closing response file: {e}")
+            self.response_log = None
+        super().closeEvent(event)
 
     def check_ollama_available(self):
         """Checks if Ollama is running and displays a warning if not."""
@@ -443,6 +1351,7 @@ class OllamaChatbotApp(QWidget):
 
 def main():
     """Main entry point of the application."""
+    open_response_cache()
     app = QApplication(sys.argv)
     window = OllamaChatbotApp()
     window.show()